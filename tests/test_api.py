@@ -1,5 +1,5 @@
 from io import BytesIO
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import numpy as np
 import pytest
@@ -12,6 +12,9 @@ def mock_tagger():
         mock.detect_with_scores.return_value = [
             {"tag": "cadeira", "confidence": 0.92, "bbox": [10.0, 10.0, 80.0, 90.0]}
         ]
+        mock.detect_with_scores_batch.side_effect = lambda images: [
+            [{"tag": "cadeira", "confidence": 0.92, "bbox": [10.0, 10.0, 80.0, 90.0]}] for _ in images
+        ]
         yield mock
 
 
@@ -58,6 +61,15 @@ async def test_detect_success(client):
     assert body["tags"] == ["cadeira"]
 
 
+@pytest.mark.asyncio
+async def test_detect_accepts_uppercase_content_type(client):
+    resp = await client.post(
+        "/detect",
+        files={"file": ("test.jpg", BytesIO(_jpeg_bytes()), "image/JPEG")},
+    )
+    assert resp.status_code == 200
+
+
 @pytest.mark.asyncio
 async def test_detect_empty_file_returns_400(client):
     resp = await client.post(
@@ -67,6 +79,47 @@ async def test_detect_empty_file_returns_400(client):
     assert resp.status_code == 400
 
 
+@pytest.mark.asyncio
+async def test_detect_oversized_file_returns_413(client):
+    from visiontag.api import _config
+
+    with patch.object(_config, "api_max_upload_bytes", 1024):
+        resp = await client.post(
+            "/detect",
+            files={"file": ("big.jpg", BytesIO(b"x" * 200_000), "image/jpeg")},
+        )
+    assert resp.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_rejected_without_reading():
+    from fastapi import HTTPException
+
+    from visiontag.api import _read_capped
+
+    upload = MagicMock()
+    upload.size = 2048
+    with pytest.raises(HTTPException) as exc_info:
+        await _read_capped(upload, limit=1024)
+    assert exc_info.value.status_code == 413
+    upload.read.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_upload_of_unknown_size_is_read_with_a_bound():
+    from fastapi import HTTPException
+
+    from visiontag.api import _read_capped
+
+    upload = MagicMock()
+    upload.size = None
+    upload.read = AsyncMock(return_value=b"x" * 1025)
+    with pytest.raises(HTTPException) as exc_info:
+        await _read_capped(upload, limit=1024)
+    assert exc_info.value.status_code == 413
+    upload.read.assert_awaited_once_with(1025)
+
+
 @pytest.mark.asyncio
 async def test_detect_unsupported_type_returns_415(client):
     resp = await client.post(
@@ -83,3 +136,95 @@ async def test_detect_invalid_image_bytes_returns_422(client):
         files={"file": ("bad.jpg", BytesIO(b"notanimage"), "image/jpeg")},
     )
     assert resp.status_code == 422
+
+
+def _jpeg_bytes():
+    import cv2
+    _, buf = cv2.imencode(".jpg", np.zeros((100, 100, 3), dtype=np.uint8))
+    return buf.tobytes()
+
+
+@pytest.mark.asyncio
+async def test_detect_batch_reports_per_file_results(client, mock_tagger):
+    img_bytes = _jpeg_bytes()
+    resp = await client.post(
+        "/detect/batch",
+        files=[
+            ("files", ("a.jpg", BytesIO(img_bytes), "image/jpeg")),
+            ("files", ("bad.jpg", BytesIO(b"notanimage"), "image/jpeg")),
+            ("files", ("b.jpg", BytesIO(img_bytes), "image/jpeg")),
+        ],
+    )
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["filename"] for r in results] == ["a.jpg", "bad.jpg", "b.jpg"]
+    assert results[0]["tags"] == ["cadeira"]
+    assert "error" in results[1]
+    assert results[2]["tags"] == ["cadeira"]
+    mock_tagger.detect_with_scores_batch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_detect_batch_splits_across_inference_workers(client, mock_tagger):
+    from visiontag.api import _config
+
+    img_bytes = _jpeg_bytes()
+    files = [("files", (f"{i}.jpg", BytesIO(img_bytes), "image/jpeg")) for i in range(4)]
+    with patch.object(_config, "inference_concurrency", 2):
+        resp = await client.post("/detect/batch", files=files)
+
+    assert resp.status_code == 200
+    assert len(resp.json()["results"]) == 4
+    assert mock_tagger.detect_with_scores_batch.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_detect_batch_limits_in_flight_sub_batches_to_pool_size(client, mock_tagger):
+    import threading
+    import time
+
+    from visiontag.api import _config
+
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def detect(images):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.pop()
+        return [[] for _ in images]
+
+    mock_tagger.detect_with_scores_batch.side_effect = detect
+    img_bytes = _jpeg_bytes()
+    files = [("files", (f"{i}.jpg", BytesIO(img_bytes), "image/jpeg")) for i in range(40)]
+    with patch.object(_config, "api_max_batch_files", 40), patch.object(_config, "inference_concurrency", 1):
+        resp = await client.post("/detect/batch", files=files)
+
+    assert resp.status_code == 200
+    assert mock_tagger.detect_with_scores_batch.call_count == 3
+    assert max(peak) == 1
+
+
+def test_sub_batch_size_follows_inference_concurrency():
+    from visiontag.api import _config, _sub_batch_size
+
+    with patch.object(_config, "inference_concurrency", 3):
+        assert _sub_batch_size(10) == 4
+        assert _sub_batch_size(1) == 1
+        assert _sub_batch_size(100) == 16
+
+
+@pytest.mark.asyncio
+async def test_detect_batch_too_many_files_returns_400(client):
+    from visiontag.api import _config
+
+    files = [
+        ("files", (f"{i}.jpg", BytesIO(b"x"), "image/jpeg"))
+        for i in range(_config.api_max_batch_files + 1)
+    ]
+    resp = await client.post("/detect/batch", files=files)
+    assert resp.status_code == 400
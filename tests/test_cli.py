@@ -0,0 +1,41 @@
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from visiontag.cli import _LatestFrameReader
+
+
+def _run_with_timeout(fn, timeout=2.0):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "chamada bloqueada"
+    return result[0]
+
+
+def test_reader_returns_frames_then_stops_at_end_of_stream():
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    cap = MagicMock()
+    cap.read.side_effect = [(True, frame), (False, None)]
+    reader = _LatestFrameReader(cap)
+
+    reads = [_run_with_timeout(reader.read) for _ in range(2)]
+    reader.stop()
+
+    assert reads[0][0] is True and reads[0][1] is frame
+    assert reads[1] == (False, None)
+    cap.release.assert_called_once()
+
+
+def test_reader_exception_unblocks_read_and_releases_capture():
+    cap = MagicMock()
+    cap.read.side_effect = RuntimeError("camera desconectada")
+    reader = _LatestFrameReader(cap)
+
+    ok, frame = _run_with_timeout(reader.read)
+    reader.stop()
+
+    assert ok is False and frame is None
+    cap.release.assert_called_once()
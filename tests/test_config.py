@@ -27,3 +27,18 @@ def test_invalid_max_tags_raises():
 def test_invalid_min_area_raises():
     with pytest.raises(ValueError, match="min_area_ratio"):
         VisionTagConfig(min_area_ratio=1.0)
+
+
+def test_invalid_max_batch_files_raises():
+    with pytest.raises(ValueError, match="api_max_batch_files"):
+        VisionTagConfig(api_max_batch_files=0)
+
+
+def test_invalid_engine_raises():
+    with pytest.raises(ValueError, match="engine"):
+        VisionTagConfig(engine="tflite")
+
+
+def test_invalid_inference_concurrency_raises():
+    with pytest.raises(ValueError, match="inference_concurrency"):
+        VisionTagConfig(inference_concurrency=0)
@@ -4,7 +4,14 @@ import numpy as np
 import pytest
 
 from visiontag.config import VisionTagConfig
-from visiontag.detector import VisionTagger
+from visiontag.detector import _MODEL_CACHE, VisionTagger
+
+
+@pytest.fixture(autouse=True)
+def _clear_model_cache():
+    _MODEL_CACHE.clear()
+    yield
+    _MODEL_CACHE.clear()
 
 
 def _make_tagger(include_person=False, conf=0.7, max_tags=5, min_area_ratio=0.0):
@@ -22,15 +29,14 @@ def _make_tagger(include_person=False, conf=0.7, max_tags=5, min_area_ratio=0.0)
 
 def _make_result(detections):
     """detections: list of (conf, cls_id, label, x1, y1, x2, y2)"""
-    import torch
-
     mock_result = MagicMock()
     mock_result.names = {d[1]: d[2] for d in detections}
 
     mock_boxes = MagicMock()
-    mock_boxes.conf.cpu.return_value.tolist.return_value = [d[0] for d in detections]
-    mock_boxes.cls.cpu.return_value.tolist.return_value = [float(d[1]) for d in detections]
-    mock_boxes.xyxy.cpu.return_value.tolist.return_value = [[d[3], d[4], d[5], d[6]] for d in detections]
+    mock_boxes.data.cpu.return_value.numpy.return_value = np.array(
+        [[d[3], d[4], d[5], d[6], d[0], float(d[1])] for d in detections], dtype=np.float32,
+    ).reshape(-1, 6)
+    mock_boxes.__len__.return_value = len(detections)
     mock_result.boxes = mock_boxes
 
     return mock_result
@@ -123,10 +129,183 @@ def test_detect_with_scores_structure():
     assert len(scores[0]["bbox"]) == 4
 
 
-def test_low_confidence_detection_filtered():
+def test_confidence_threshold_delegated_to_model():
     tagger = _make_tagger(conf=0.8)
-    mock_result = _make_result([(0.75, 0, "car", 0, 0, 50, 50)])
-    tagger._model.predict.return_value = [mock_result]
+    tagger._model.predict.return_value = [_make_result([])]
 
     detections = tagger.detect_objects(_blank_image())
     assert len(detections) == 0
+    assert tagger._model.predict.call_args.kwargs["conf"] == 0.8
+
+
+def test_model_shared_between_taggers():
+    config = VisionTagConfig(min_area_ratio=0.0)
+    with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+        mock_yolo_cls.return_value = MagicMock()
+        first = VisionTagger(config=config)
+        second = VisionTagger(config=config)
+
+    assert first.model is second.model
+    mock_yolo_cls.assert_called_once_with(config.model_path)
+
+
+def test_detect_objects_batch_single_predict_call():
+    tagger = _make_tagger()
+    tagger._model.predict.return_value = [
+        _make_result([(0.9, 0, "car", 10, 10, 50, 50)]),
+        _make_result([(0.85, 1, "dog", 0, 0, 60, 60)]),
+    ]
+
+    batch = tagger.detect_objects_batch([_blank_image(), _blank_image()])
+
+    assert [[d[0] for d in dets] for dets in batch] == [["carro"], ["cachorro"]]
+    tagger._model.predict.assert_called_once()
+
+
+def test_label_tables_reused_for_equal_names_dict():
+    tagger = _make_tagger()
+    cls_ids = np.array([0, 1])
+
+    tagger._resolve_labels({0: "car", 1: "dog"}, cls_ids)
+    tables = tagger._label_tables
+    _, labels_pt = tagger._resolve_labels({0: "car", 1: "dog"}, cls_ids)
+
+    assert tagger._label_tables is tables
+    assert labels_pt.tolist() == ["carro", "cachorro"]
+
+
+def test_onnx_engine_exports_and_reloads(tmp_path):
+    model_path = tmp_path / "yolov8n.pt"
+    raw_export = tmp_path / "yolov8n.onnx"
+    raw_export.write_bytes(b"onnx")
+    config = VisionTagConfig(model_path=str(model_path), min_area_ratio=0.0, engine="onnx")
+    with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+        pt_model, onnx_model = MagicMock(), MagicMock()
+        pt_model.export.return_value = str(raw_export)
+        mock_yolo_cls.side_effect = [pt_model, onnx_model]
+        tagger = VisionTagger(config=config)
+
+    assert tagger.model is onnx_model
+    assert pt_model.export.call_args.kwargs["format"] == "onnx"
+    exported = tmp_path / "yolov8n.dynamic.onnx"
+    assert exported.exists()
+    assert mock_yolo_cls.call_args.args[0] == str(exported)
+
+
+def test_export_move_failure_uses_exported_file(tmp_path):
+    raw_export = tmp_path / "yolov8n.onnx"
+    raw_export.write_bytes(b"onnx")
+    config = VisionTagConfig(model_path=str(tmp_path / "yolov8n.pt"), min_area_ratio=0.0, engine="onnx")
+    with patch("visiontag.detector.shutil.move", side_effect=OSError("EXDEV")):
+        with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+            pt_model, onnx_model = MagicMock(), MagicMock()
+            pt_model.export.return_value = str(raw_export)
+            mock_yolo_cls.side_effect = [pt_model, onnx_model]
+            tagger = VisionTagger(config=config)
+
+    assert tagger.model is onnx_model
+    assert mock_yolo_cls.call_args.args[0] == str(raw_export)
+
+
+def test_existing_export_is_reused(tmp_path):
+    model_path = tmp_path / "yolov8n.pt"
+    (tmp_path / "yolov8n.dynamic.onnx").write_bytes(b"onnx")
+    config = VisionTagConfig(model_path=str(model_path), min_area_ratio=0.0, engine="onnx")
+    with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+        pt_model = MagicMock()
+        mock_yolo_cls.side_effect = [pt_model, MagicMock()]
+        VisionTagger(config=config)
+
+    pt_model.export.assert_not_called()
+
+
+def test_export_failure_falls_back_to_pt_model():
+    config = VisionTagConfig(min_area_ratio=0.0, engine="onnx")
+    with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+        pt_model = MagicMock()
+        pt_model.export.side_effect = RuntimeError("sem onnx")
+        mock_yolo_cls.return_value = pt_model
+        tagger = VisionTagger(config=config)
+
+    assert tagger.model is pt_model
+
+
+def test_half_precision_enabled_on_cuda():
+    with patch("visiontag.detector._cuda_available", return_value=True):
+        tagger = _make_tagger()
+    tagger._model.predict.return_value = [_make_result([])]
+
+    tagger.detect_objects(_blank_image())
+    assert tagger._model.predict.call_args.kwargs["half"] is True
+
+
+def test_half_precision_disabled_for_exported_onnx_on_cuda(tmp_path):
+    (tmp_path / "yolov8n.dynamic.onnx").write_bytes(b"onnx")
+    config = VisionTagConfig(model_path=str(tmp_path / "yolov8n.pt"), min_area_ratio=0.0, engine="onnx")
+    with patch("visiontag.detector._cuda_available", return_value=True):
+        with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+            mock_yolo_cls.side_effect = [MagicMock(), MagicMock()]
+            tagger = VisionTagger(config=config)
+    tagger._model.predict.return_value = [_make_result([])]
+
+    tagger.detect_objects(_blank_image())
+    assert tagger._model.predict.call_args.kwargs["half"] is False
+
+
+def test_warmup_runs_each_batch_size_once():
+    tagger = _make_tagger()
+
+    tagger.warmup((1, 4, 4))
+
+    sources = [c.args[0] for c in tagger._model.predict.call_args_list]
+    assert len(sources) == 2
+    assert isinstance(sources[0], np.ndarray)
+    assert len(sources[1]) == 4
+
+
+def test_inference_concurrency_builds_independent_instances():
+    config = VisionTagConfig(min_area_ratio=0.0, inference_concurrency=2)
+    models = [MagicMock(), MagicMock()]
+    with patch("visiontag.detector.YOLO") as mock_yolo_cls:
+        mock_yolo_cls.side_effect = models
+        tagger = VisionTagger(config=config)
+
+    tagger.warmup((1,))
+    assert all(model.predict.call_count == 1 for model in models)
+
+
+def test_unsorted_model_output_ordered_by_confidence():
+    tagger = _make_tagger()
+    mock_result = _make_result([
+        (0.75, 0, "car", 0, 0, 50, 50),
+        (0.95, 1, "dog", 0, 0, 50, 50),
+        (0.85, 0, "car", 60, 0, 100, 50),
+    ])
+    tagger._model.predict.return_value = [mock_result]
+
+    detections = tagger.detect_objects(_blank_image())
+    assert [d[0] for d in detections] == ["cachorro", "carro"]
+    assert detections[1][1] == pytest.approx(0.85)
+
+
+def test_out_of_bounds_bbox_clipped_to_image():
+    tagger = _make_tagger()
+    mock_result = _make_result([(0.9, 0, "car", -5, 10, 120, 50)])
+    tagger._model.predict.return_value = [mock_result]
+
+    detections = tagger.detect_objects(_blank_image(100, 100))
+    assert detections[0][2] == [0.0, 10.0, 100.0, 50.0]
+
+
+def test_detect_arrays_returns_parallel_arrays():
+    tagger = _make_tagger()
+    mock_result = _make_result([
+        (0.95, 0, "car", 0, 0, 50, 50),
+        (0.90, 1, "dog", 10, 10, 60, 60),
+    ])
+    tagger._model.predict.return_value = [mock_result]
+
+    arrays = tagger.detect_arrays(_blank_image())
+    assert arrays.labels.tolist() == ["carro", "cachorro"]
+    assert arrays.confidences.shape == (2,)
+    assert arrays.boxes.shape == (2, 4)
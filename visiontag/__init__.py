@@ -1,4 +1,4 @@
-__all__ = ["VisionTagger", "VisionTagConfig"]
+__all__ = ["VisionTagger", "VisionTagConfig", "DetectionArrays"]
 
 from .config import VisionTagConfig
-from .detector import VisionTagger
+from .detector import DetectionArrays, VisionTagger
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -14,8 +15,9 @@ from .detector import VisionTagger
 
 logger = logging.getLogger(__name__)
 
-_ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp"}
-_START_TIME = time.time()
+_ALLOWED_CONTENT_TYPES = frozenset({"image/jpeg", "image/png", "image/webp", "image/bmp"})
+_INFERENCE_BATCH_SIZE = 16
+_START_TIME = time.monotonic()
 
 _config = VisionTagConfig()
 _tagger: VisionTagger | None = None
@@ -26,6 +28,13 @@ async def lifespan(app: FastAPI):
     global _tagger
     logger.info("Inicializando VisionTagger...")
     _tagger = VisionTagger(config=_config)
+    # Aquece os mesmos tamanhos de sub-lote que /detect/batch usa com o lote maximo.
+    max_files = _config.api_max_batch_files
+    sub_batch = _sub_batch_size(max_files)
+    try:
+        _tagger.warmup((1, sub_batch, max_files % sub_batch or sub_batch))
+    except RuntimeError:
+        logger.warning("Falha no aquecimento do modelo; a primeira requisicao sera mais lenta")
     logger.info("VisionTagger pronto.")
     yield
     logger.info("Encerrando VisionTag API.")
@@ -47,7 +56,7 @@ def _get_tagger() -> VisionTagger:
 
 @app.get("/health", summary="Verificacao de saude")
 async def health():
-    return {"status": "ok", "uptime_seconds": round(time.time() - _START_TIME, 1)}
+    return {"status": "ok", "uptime_seconds": round(time.monotonic() - _START_TIME, 1)}
 
 
 @app.get("/info", summary="Informacoes do modelo")
@@ -58,39 +67,126 @@ async def info():
         "max_tags": _config.max_tags,
         "min_area_ratio": _config.min_area_ratio,
         "include_person": _config.include_person,
+        "max_batch_files": _config.api_max_batch_files,
+        "inference_concurrency": _config.inference_concurrency,
     }
 
 
-@app.post("/detect", summary="Detectar objetos em uma imagem")
-async def detect(file: UploadFile = File(..., description="Imagem JPG, PNG ou WebP")):
-    if file.content_type and file.content_type not in _ALLOWED_CONTENT_TYPES:
+def _sub_batch_size(n_images: int) -> int:
+    """Tamanho dos sub-lotes de /detect/batch: repartidos entre as instancias do pool, no maximo 16."""
+    workers = _config.inference_concurrency
+    return min(_INFERENCE_BATCH_SIZE, max(1, -(-n_images // workers)))
+
+
+def _is_allowed_content_type(content_type: str) -> bool:
+    # Caminho comum (ja em minusculas) sem alocar; MIME types nao diferenciam caixa.
+    return content_type in _ALLOWED_CONTENT_TYPES or content_type.lower() in _ALLOWED_CONTENT_TYPES
+
+
+async def _read_image(file: UploadFile) -> np.ndarray:
+    if file.content_type and not _is_allowed_content_type(file.content_type):
         raise HTTPException(
             status_code=415,
             detail="Tipo de arquivo nao suportado. Use JPEG, PNG, WebP ou BMP.",
         )
 
-    data = await file.read()
+    data = await _read_capped(file, _config.api_max_upload_bytes)
 
     if not data:
         raise HTTPException(status_code=400, detail="Arquivo vazio")
 
-    if len(data) > _config.api_max_upload_bytes:
-        limit_mb = _config.api_max_upload_bytes // (1024 * 1024)
+    return await asyncio.to_thread(_decode_image, data)
+
+
+async def _read_capped(file: UploadFile, limit: int) -> bytes:
+    """Le no maximo ``limit + 1`` bytes do upload, rejeitando arquivos acima do limite."""
+    limit_mb = limit // (1024 * 1024)
+
+    # Tamanho ja informado pelo parser multipart: rejeita sem ler o corpo.
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"Arquivo muito grande. Limite: {limit_mb} MB")
+
+    # Leitura unica e limitada: um byte alem do limite basta para detectar o excesso.
+    data = await file.read(limit + 1)
+    if len(data) > limit:
         raise HTTPException(status_code=413, detail=f"Arquivo muito grande. Limite: {limit_mb} MB")
+    return data
 
+
+def _decode_image(data: bytes) -> np.ndarray:
     image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
     if image is None:
         raise HTTPException(status_code=422, detail="Nao foi possivel decodificar a imagem")
+    return image
+
+
+@app.post("/detect", summary="Detectar objetos em uma imagem")
+async def detect(file: UploadFile = File(..., description="Imagem JPG, PNG ou WebP")):
+    image = await _read_image(file)
 
     tagger = _get_tagger()
     try:
-        detections = tagger.detect_with_scores(image)
+        # Inferencia bloqueante roda no threadpool para nao travar o event loop.
+        detections = await asyncio.to_thread(tagger.detect_with_scores, image)
     except (ValueError, RuntimeError) as exc:
         logger.exception("Erro na deteccao")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
     tags = [d["tag"] for d in detections]
-    return {"tags": tags, "detections": detections}
+    return JSONResponse(content={"tags": tags, "detections": detections})
+
+
+@app.post("/detect/batch", summary="Detectar objetos em varias imagens")
+async def detect_batch(files: list[UploadFile] = File(..., description="Imagens JPG, PNG, WebP ou BMP")):
+    if len(files) > _config.api_max_batch_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Muitos arquivos. Limite por lote: {_config.api_max_batch_files}",
+        )
+
+    # Leituras concorrentes; a decodificacao roda em threads fora do event loop.
+    decoded = await asyncio.gather(*(_read_image(file) for file in files), return_exceptions=True)
+
+    results: list[dict | None] = [None] * len(files)
+    images = []
+    positions = []
+    for idx, (file, outcome) in enumerate(zip(files, decoded)):
+        if isinstance(outcome, HTTPException):
+            results[idx] = {"filename": file.filename, "error": outcome.detail}
+            continue
+        if isinstance(outcome, BaseException):
+            raise outcome
+        images.append(outcome)
+        positions.append(idx)
+
+    tagger = _get_tagger()
+    # Sub-lotes repartidos entre as instancias do pool de inferencia e executados em paralelo.
+    chunk_size = _sub_batch_size(len(images))
+    chunks = [slice(start, start + chunk_size) for start in range(0, len(images), chunk_size)]
+    # No maximo um sub-lote por instancia em voo: os excedentes esperam no event loop em vez
+    # de ocupar threads do executor padrao (usadas tambem na decodificacao) bloqueadas no pool.
+    slots = asyncio.Semaphore(_config.inference_concurrency)
+
+    async def run_chunk(chunk: slice) -> list:
+        async with slots:
+            return await asyncio.to_thread(tagger.detect_with_scores_batch, images[chunk])
+
+    try:
+        batches = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    except (ValueError, RuntimeError) as exc:
+        logger.exception("Erro na deteccao em lote")
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    for chunk, batch in zip(chunks, batches):
+        for idx, detections in zip(positions[chunk], batch):
+            results[idx] = {
+                "filename": files[idx].filename,
+                "tags": [d["tag"] for d in detections],
+                "detections": detections,
+            }
+
+    # Conteudo ja composto de tipos JSON nativos: dispensa o jsonable_encoder do FastAPI.
+    return JSONResponse(content={"results": results})
 
 
 @app.exception_handler(Exception)
@@ -4,18 +4,22 @@ import argparse
 import json
 import logging
 import sys
+import threading
 from pathlib import Path
 
 import cv2
 
 from .config import VisionTagConfig, setup_logging
-from .detector import VisionTagger
+from .detector import _EXPORT_BATCH_SIZE, VisionTagger
 
 logger = logging.getLogger(__name__)
 
 _IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tiff", ".tif"}
 _VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".flv"}
 
+_BOX_COLOR = (0, 200, 0)
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -35,6 +39,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--show", action="store_true", help="Exibir janela com preview e bboxes")
     parser.add_argument("--output", metavar="PATH", help="Salvar imagem/video anotado neste caminho")
     parser.add_argument("--stride", type=int, default=1, help="Processar a cada N frames (webcam/video)")
+    parser.add_argument("--batch", type=int, default=1, help="Frames por inferencia em lote (webcam/video)")
     parser.add_argument("--print-every", action="store_true", help="Emitir JSON mesmo sem mudanca de tags")
     parser.add_argument(
         "--log-level", default="INFO",
@@ -52,11 +57,11 @@ def emit(tags: list) -> None:
 def draw_detections(frame, detections) -> None:
     for label, conf, xyxy in detections:
         x1, y1, x2, y2 = (int(v) for v in xyxy)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 200, 0), 2)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), _BOX_COLOR, 2)
         text = "{} {:.2f}".format(label, conf)
         cv2.putText(
             frame, text, (x1, max(0, y1 - 8)),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 2, cv2.LINE_AA,
+            _FONT, 0.6, _BOX_COLOR, 2, cv2.LINE_AA,
         )
 
 
@@ -68,6 +73,54 @@ def _make_video_writer(output_path, cap):
     return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
 
+class _LatestFrameReader:
+    """Le a captura em uma thread propria e entrega sempre o frame mais recente.
+
+    A thread de leitura e dona da captura: ela chama ``release()`` ao sair, para
+    que a captura nunca seja liberada enquanto um ``read()`` ainda esta em curso.
+    """
+
+    def __init__(self, cap):
+        self._cap = cap
+        self._cond = threading.Condition()
+        self._frame = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="visiontag-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                ok, frame = self._cap.read()
+                with self._cond:
+                    if not ok or self._stopped:
+                        return
+                    self._frame = frame
+                    self._cond.notify_all()
+        except Exception:
+            logger.exception("Erro ao ler frame da captura")
+        finally:
+            # Sempre acorda read(), inclusive quando a leitura falha com excecao.
+            with self._cond:
+                self._stopped = True
+                self._cond.notify_all()
+            self._cap.release()
+
+    def read(self):
+        with self._cond:
+            while self._frame is None and not self._stopped:
+                self._cond.wait()
+            frame, self._frame = self._frame, None
+        return frame is not None, frame
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+        self._thread.join(timeout=1.0)
+        if self._thread.is_alive():
+            logger.warning("Leitura da captura ainda bloqueada; a captura sera liberada quando ela terminar")
+
+
 def run_image(tagger, path, output) -> int:
     image = cv2.imread(path)
     if image is None:
@@ -90,47 +143,75 @@ def run_image(tagger, path, output) -> int:
     return 0
 
 
-def _process_capture(tagger, cap, show, stride, print_every, writer, window_name) -> int:
+def _detect_frames(tagger, frames, first_idx) -> list:
+    try:
+        if len(frames) == 1:
+            return [tagger.detect_objects(frames[0])]
+        return tagger.detect_objects_batch(frames)
+    except Exception:
+        logger.exception("Erro ao processar frame %d", first_idx)
+        return [[] for _ in frames]
+
+
+def _process_capture(tagger, cap, show, stride, print_every, writer, window_name, batch_size=1) -> int:
     frame_idx = 0
     last_tags = None
     last_detections = []
+    batch_size = max(1, batch_size)
+    pending = []
+    batch = []
+    batch_start = 0
 
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
+    def flush() -> bool:
+        nonlocal last_tags, last_detections
+        results = iter(_detect_frames(tagger, batch, batch_start) if batch else [])
 
-        if frame_idx % max(1, stride) == 0:
-            try:
-                detections = tagger.detect_objects(frame)
-            except Exception:
-                logger.exception("Erro ao processar frame %d", frame_idx)
-                detections = []
+        for frame, analyzed in pending:
+            if analyzed:
+                last_detections = next(results)
+                tags = [label for label, _, _ in last_detections]
 
-            last_detections = detections
-            tags = [label for label, _, _ in detections]
+                if print_every or tags != last_tags:
+                    emit(tags)
+                    last_tags = tags
 
-            if print_every or tags != last_tags:
-                emit(tags)
-                last_tags = tags
+            # O frame cru nao e reutilizado depois da inferencia; desenha direto nele.
+            draw_detections(frame, last_detections)
 
-        view = frame.copy()
-        draw_detections(view, last_detections)
+            if writer:
+                writer.write(frame)
 
-        if writer:
-            writer.write(view)
+            if show:
+                cv2.imshow(window_name, frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    return False
 
-        if show:
-            cv2.imshow(window_name, view)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+        pending.clear()
+        batch.clear()
+        return True
+
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
 
+        analyzed = frame_idx % max(1, stride) == 0
+        if analyzed:
+            if not batch:
+                batch_start = frame_idx
+            batch.append(frame)
+        pending.append((frame, analyzed))
         frame_idx += 1
 
+        # Frames fora do stride so esperam quando ha um lote em formacao.
+        if (len(batch) >= batch_size or not batch) and not flush():
+            return 0
+
+    flush()
     return 0
 
 
-def run_video(tagger, path, show, stride, output, print_every) -> int:
+def run_video(tagger, path, show, stride, output, print_every, batch_size=1) -> int:
     cap = cv2.VideoCapture(path)
     if not cap.isOpened():
         logger.error("Nao foi possivel abrir o video: %s", path)
@@ -139,7 +220,9 @@ def run_video(tagger, path, show, stride, output, print_every) -> int:
 
     writer = _make_video_writer(output, cap) if output else None
     try:
-        return _process_capture(tagger, cap, show, stride, print_every, writer, "VisionTag - Video")
+        return _process_capture(
+            tagger, cap, show, stride, print_every, writer, "VisionTag - Video", batch_size,
+        )
     finally:
         cap.release()
         if writer:
@@ -149,18 +232,23 @@ def run_video(tagger, path, show, stride, output, print_every) -> int:
             cv2.destroyAllWindows()
 
 
-def run_webcam(tagger, device, show, stride, output, print_every) -> int:
+def run_webcam(tagger, device, show, stride, output, print_every, batch_size=1) -> int:
     cap = cv2.VideoCapture(device)
     if not cap.isOpened():
         logger.error("Webcam indisponivel: indice %d", device)
         print("Erro: webcam nao disponivel", file=sys.stderr)
         return 1
 
+    # Buffer minimo no driver e leitura em paralelo a inferencia: frames antigos sao descartados.
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     writer = _make_video_writer(output, cap) if output else None
+    reader = _LatestFrameReader(cap)
     try:
-        return _process_capture(tagger, cap, show, stride, print_every, writer, "VisionTag - Webcam")
+        return _process_capture(
+            tagger, reader, show, stride, print_every, writer, "VisionTag - Webcam", batch_size,
+        )
     finally:
-        cap.release()
+        reader.stop()
         if writer:
             writer.release()
             logger.info("Video da webcam salvo em: %s", output)
@@ -180,6 +268,11 @@ def main() -> int:
         include_person=args.include_person,
     )
 
+    # O motor TensorRT e exportado com lote maximo fixo; lotes maiores falhariam na inferencia.
+    if config.engine in ("trt", "auto") and args.batch > _EXPORT_BATCH_SIZE:
+        logger.warning("--batch %d excede o lote maximo do motor exportado; usando %d", args.batch, _EXPORT_BATCH_SIZE)
+        args.batch = _EXPORT_BATCH_SIZE
+
     try:
         tagger = VisionTagger(config=config)
     except RuntimeError as exc:
@@ -189,10 +282,12 @@ def main() -> int:
     if args.source:
         ext = Path(args.source).suffix.lower()
         if ext in _VIDEO_EXTENSIONS:
-            return run_video(tagger, args.source, args.show, args.stride, args.output, args.print_every)
+            return run_video(
+                tagger, args.source, args.show, args.stride, args.output, args.print_every, args.batch,
+            )
         return run_image(tagger, args.source, args.output)
 
-    return run_webcam(tagger, args.webcam, args.show, args.stride, args.output, args.print_every)
+    return run_webcam(tagger, args.webcam, args.show, args.stride, args.output, args.print_every, args.batch)
 
 
 if __name__ == "__main__":
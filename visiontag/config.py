@@ -5,6 +5,9 @@ import os
 from dataclasses import dataclass, field
 
 
+_ALLOWED_ENGINES = {"off", "auto", "trt", "onnx"}
+
+
 @dataclass
 class VisionTagConfig:
     model_path: str = field(default_factory=lambda: os.getenv("VISIONTAG_MODEL", "yolov8n.pt"))
@@ -13,7 +16,10 @@ class VisionTagConfig:
     min_area_ratio: float = field(default_factory=lambda: float(os.getenv("VISIONTAG_MIN_AREA", "0.01")))
     include_person: bool = field(default_factory=lambda: os.getenv("VISIONTAG_INCLUDE_PERSON", "0") == "1")
     api_max_upload_bytes: int = field(default_factory=lambda: int(os.getenv("VISIONTAG_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+    api_max_batch_files: int = field(default_factory=lambda: int(os.getenv("VISIONTAG_MAX_BATCH_FILES", "10")))
     log_level: str = field(default_factory=lambda: os.getenv("VISIONTAG_LOG_LEVEL", "INFO"))
+    engine: str = field(default_factory=lambda: os.getenv("VISIONTAG_ENGINE", "off").lower())
+    inference_concurrency: int = field(default_factory=lambda: int(os.getenv("VISIONTAG_INFERENCE_CONCURRENCY", "1")))
 
     def __post_init__(self) -> None:
         if not 0.0 < self.conf <= 1.0:
@@ -22,6 +28,12 @@ class VisionTagConfig:
             raise ValueError(f"max_tags deve ser >= 1, recebido: {self.max_tags}")
         if not 0.0 <= self.min_area_ratio < 1.0:
             raise ValueError(f"min_area_ratio deve estar entre 0 e 1, recebido: {self.min_area_ratio}")
+        if self.engine not in _ALLOWED_ENGINES:
+            raise ValueError(f"engine deve ser um de {sorted(_ALLOWED_ENGINES)}, recebido: {self.engine}")
+        if self.inference_concurrency < 1:
+            raise ValueError(f"inference_concurrency deve ser >= 1, recebido: {self.inference_concurrency}")
+        if self.api_max_batch_files < 1:
+            raise ValueError(f"api_max_batch_files deve ser >= 1, recebido: {self.api_max_batch_files}")
 
 
 _ALLOWED_LOG_LEVELS = {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}
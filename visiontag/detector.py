@@ -1,11 +1,21 @@
 from __future__ import annotations
 
 import logging
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
 
 import numpy as np
 
+try:
+    from ultralytics import YOLO
+except ImportError:  # pragma: no cover - dependência obrigatória em produção
+    YOLO = None
+
 from .config import VisionTagConfig
 from .labels_pt import translate_label
 
@@ -13,6 +23,120 @@ logger = logging.getLogger(__name__)
 
 Detection = Tuple[str, float, List[float]]
 
+_MODEL_CACHE: Dict[Tuple[str, str, int], _ModelPool] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+_EXPORT_BATCH_SIZE = 16
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _export_model(model, model_path: str, engine: str):
+    """Exporta o modelo para TensorRT/ONNX (reutilizando o arquivo ao lado do .pt) e o recarrega."""
+    if engine == "auto":
+        engine = "trt" if _cuda_available() else "onnx"
+
+    if engine == "trt":
+        fmt, tag = "engine", f"dynamic-b{_EXPORT_BATCH_SIZE}-fp16"
+        export_kwargs = {"half": True, "dynamic": True, "batch": _EXPORT_BATCH_SIZE}
+    else:
+        fmt, tag, export_kwargs = "onnx", "dynamic", {"dynamic": True}
+
+    # Os parâmetros de exportação fazem parte do nome: um artefato gerado com
+    # outras opções nunca é reaproveitado por engano.
+    exported = Path(model_path).with_suffix(f".{tag}.{fmt}")
+    if exported.exists():
+        logger.info("Reutilizando modelo exportado (apague o arquivo para reexportar): %s", exported)
+    else:
+        output = model.export(format=fmt, **export_kwargs)
+        try:
+            # shutil.move também funciona entre sistemas de arquivos (ex.: volume de pesos montado).
+            shutil.move(str(output), str(exported))
+        except OSError:
+            logger.warning(
+                "Não foi possível mover o modelo exportado para '%s'; usando '%s' nesta execução",
+                exported, output, exc_info=True,
+            )
+            exported = Path(output)
+        logger.info("Modelo exportado (%s): %s", fmt, exported)
+    return YOLO(str(exported), task="detect")
+
+
+class _ModelPool:
+    """Instâncias independentes do mesmo modelo; cada ``predict`` usa uma instância exclusiva.
+
+    O predictor do ultralytics guarda estado e não é seguro entre threads, então
+    a concorrência de inferência é limitada ao número de instâncias do pool.
+    """
+
+    def __init__(self, models: List[Any], half: bool = False) -> None:
+        self.models = models
+        self.half = half
+        self._idle: queue.SimpleQueue = queue.SimpleQueue()
+        for model in models:
+            self._idle.put(model)
+
+    @contextmanager
+    def acquire(self):
+        model = self._idle.get()
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+
+def _build_model(model_path: str, engine: str) -> Tuple[Any, bool]:
+    """Carrega (e opcionalmente exporta) o modelo; indica também se ele continua sendo um checkpoint .pt."""
+    if YOLO is None:
+        raise RuntimeError("pacote 'ultralytics' não instalado")
+    model = YOLO(model_path)
+    logger.info("Modelo carregado: %s", model_path)
+    is_pytorch = model_path.endswith(".pt")
+    if engine != "off" and is_pytorch:
+        try:
+            model = _export_model(model, model_path, engine)
+            is_pytorch = False
+        except Exception:
+            logger.warning(
+                "Falha ao exportar '%s' (%s); usando o modelo original",
+                model_path, engine, exc_info=True,
+            )
+    return model, is_pytorch
+
+
+def _load_model(model_path: str, engine: str = "off", concurrency: int = 1) -> _ModelPool:
+    """Carrega o pool de modelos uma única vez por configuração e o compartilha entre instâncias."""
+    key = (model_path, engine, concurrency)
+    with _MODEL_CACHE_LOCK:
+        pool = _MODEL_CACHE.get(key)
+        if pool is None:
+            built = [_build_model(model_path, engine) for _ in range(concurrency)]
+            # FP16 no predict só vale para checkpoints .pt em GPU: modelos ONNX
+            # exportados em FP32 rejeitam entradas half, e o TensorRT já define a
+            # precisão na exportação.
+            half = _cuda_available() and all(is_pytorch for _, is_pytorch in built)
+            pool = _MODEL_CACHE[key] = _ModelPool([model for model, _ in built], half=half)
+        return pool
+
+
+class DetectionArrays(NamedTuple):
+    """Detecções em formato compacto (SoA), sem um objeto Python por detecção."""
+
+    labels: np.ndarray
+    confidences: np.ndarray
+    boxes: np.ndarray
+
+
+def _empty_arrays() -> DetectionArrays:
+    return DetectionArrays(
+        np.empty(0, dtype=object), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32),
+    )
+
 
 @dataclass
 class VisionTagger:
@@ -22,87 +146,159 @@ class VisionTagger:
 
     def __post_init__(self) -> None:
         try:
-            from ultralytics import YOLO
-            self._model = YOLO(self.config.model_path)
-            logger.info("Modelo carregado: %s", self.config.model_path)
+            self._pool = _load_model(self.config.model_path, self.config.engine, self.config.inference_concurrency)
+            self._model = self._pool.models[0]
+            self._half = self._pool.half
         except Exception as exc:
             logger.exception("Falha ao carregar modelo '%s'", self.config.model_path)
             raise RuntimeError(f"Não foi possível carregar o modelo: {exc}") from exc
+        self._label_tables: Tuple[Dict[int, str], np.ndarray, np.ndarray] | None = None
 
     @property
     def model(self):
         return self._model
 
+    def warmup(self, batch_sizes: Iterable[int] = (1,), imgsz: int = 640) -> None:
+        """Executa inferências descartáveis para inicializar kernels antes da primeira requisição."""
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for batch_size in sorted(set(batch_sizes)):
+            # O pool é FIFO: N chamadas seguidas passam por todas as instâncias.
+            for _ in self._pool.models:
+                self._predict(dummy if batch_size == 1 else [dummy] * batch_size)
+        logger.info("Modelo aquecido (lotes: %s)", sorted(set(batch_sizes)))
+
     def _is_valid_image(self, image: np.ndarray) -> bool:
         return image is not None and isinstance(image, np.ndarray) and image.ndim in (2, 3) and image.size > 0
 
-    def detect_objects(self, image: np.ndarray) -> List[Detection]:
-        """Retorna lista de (label_pt, confiança, bbox) ordenada por confiança."""
-        if not self._is_valid_image(image):
-            raise ValueError("Imagem inválida ou vazia")
-
-        height, width = image.shape[:2]
-        min_area_px = max(0.0, self.config.min_area_ratio) * float(height * width)
-
+    def _predict(self, source) -> list:
         try:
-            results = self._model.predict(image, conf=self.config.conf, verbose=False)
+            with self._pool.acquire() as model:
+                return model.predict(source, conf=self.config.conf, half=self._half, verbose=False)
         except Exception as exc:
             logger.exception("Erro durante a predição do modelo")
             raise RuntimeError("Falha na predição") from exc
 
+    def _resolve_labels(self, names: Dict[int, str], cls_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Mapeia ids de classe para (label_en, label_pt) usando tabelas montadas uma vez por modelo."""
+        tables = self._label_tables
+        # Entrada única: as instâncias do pool compartilham as mesmas classes. Um dict
+        # novo com o mesmo conteúdo reaproveita as tabelas; só outro conteúdo as reconstrói.
+        if tables is None or (tables[0] is not names and tables[0] != names):
+            size = max(names, default=-1) + 1
+            table_en = np.array([names.get(cls_id, str(cls_id)) for cls_id in range(size)], dtype=object)
+            table_pt = np.array([translate_label(label) for label in table_en.tolist()], dtype=object)
+            tables = self._label_tables = (names, table_en, table_pt)
+
+        _, table_en, table_pt = tables
+        if cls_ids.size and (cls_ids.min() < 0 or cls_ids.max() >= len(table_en)):
+            labels_en = np.array([names.get(cls_id, str(cls_id)) for cls_id in cls_ids.tolist()], dtype=object)
+            return labels_en, np.array([translate_label(label) for label in labels_en.tolist()], dtype=object)
+        return table_en[cls_ids], table_pt[cls_ids]
+
+    def detect_arrays(self, image: np.ndarray) -> DetectionArrays:
+        """Retorna (labels_pt, confianças, bboxes Nx4) filtrados como arrays paralelos, ordenados por confiança."""
+        if not self._is_valid_image(image):
+            raise ValueError("Imagem inválida ou vazia")
+
+        results = self._predict(image)
         if not results:
-            return []
+            return _empty_arrays()
+        return self._filter_result(results[0], image.shape[:2])
+
+    def _filter_result(self, result, shape: Tuple[int, int]) -> DetectionArrays:
+        config = self.config
+        height, width = shape
+        min_area_px = config.min_area_ratio * float(height * width)
 
-        result = results[0]
         boxes = result.boxes
         if boxes is None or len(boxes) == 0:
-            return []
+            return _empty_arrays()
 
-        confs = boxes.conf.cpu().tolist()
-        clss = boxes.cls.cpu().tolist()
-        xyxys = boxes.xyxy.cpu().tolist()
-        names = result.names
+        # Uma única cópia device->host: colunas [x1, y1, x2, y2, (id,) conf, cls].
+        data = boxes.data.cpu().numpy()
+        confs = data[:, -2].astype(np.float32)
+        cls_ids = data[:, -1].astype(np.int64)
+        labels_en, labels_pt = self._resolve_labels(result.names, cls_ids)
 
-        items = sorted(zip(confs, clss, xyxys), key=lambda x: x[0], reverse=True)
+        # Recorte e área calculados uma única vez para todas as caixas, fora do loop.
+        # astype copia, então o clip in-place não altera o tensor do resultado.
+        # O ultralytics normalmente já devolve caixas dentro da imagem; nesse
+        # caso o recorte é dispensado.
+        xyxy = data[:, :4].astype(np.float32)
+        if xyxy.min() < 0.0 or xyxy[:, 0::2].max() > width or xyxy[:, 1::2].max() > height:
+            np.clip(xyxy[:, 0::2], 0.0, width, out=xyxy[:, 0::2])
+            np.clip(xyxy[:, 1::2], 0.0, height, out=xyxy[:, 1::2])
 
-        detections: List[Detection] = []
-        seen_labels: set[str] = set()
+        # O limiar de confiança já é aplicado pelo próprio model.predict(conf=...).
+        if min_area_px > 0:
+            keep = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1]) >= min_area_px
+        else:
+            keep = np.ones(len(confs), dtype=bool)
 
-        for conf, cls_id, xyxy in items:
-            if conf < self.config.conf:
-                continue
+        if not config.include_person:
+            keep &= labels_en != "person"
 
-            cls_id = int(cls_id)
-            label_en = names.get(cls_id, str(cls_id))
+        order = np.flatnonzero(keep)
+        if order.size == 0:
+            return _empty_arrays()
+        # O NMS do ultralytics já devolve as caixas em ordem decrescente de
+        # confiança; só ordena (O(N log N)) quando isso não se confirma (O(N)).
+        kept_confs = confs[order]
+        if (kept_confs[1:] > kept_confs[:-1]).any():
+            order = order[np.argsort(-kept_confs, kind="stable")]
 
-            if not self.config.include_person and label_en == "person":
-                continue
+        # Como os índices já estão ordenados por confiança, a primeira ocorrência
+        # de cada label é a de maior confiança.
+        labels_pt = labels_pt[order]
+        _, first = np.unique(labels_pt, return_index=True)
+        first = np.sort(first)[: config.max_tags]
+        order = order[first]
 
-            if min_area_px > 0:
-                x1, y1, x2, y2 = xyxy
-                area = max(0.0, x2 - x1) * max(0.0, y2 - y1)
-                if area < min_area_px:
-                    continue
+        logger.debug("Detectados %d objeto(s) na imagem", order.size)
+        return DetectionArrays(labels_pt[first], confs[order], xyxy[order])
 
-            label_pt = translate_label(label_en)
+    def detect_arrays_batch(self, images: List[np.ndarray]) -> List[DetectionArrays]:
+        """Versão em lote de detect_arrays, com uma única chamada ao modelo."""
+        if not images:
+            return []
+        if not all(self._is_valid_image(image) for image in images):
+            raise ValueError("Imagem inválida ou vazia")
 
-            if label_pt not in seen_labels:
-                detections.append((label_pt, float(conf), xyxy))
-                seen_labels.add(label_pt)
+        results = self._predict(list(images))
+        if len(results) != len(images):
+            raise RuntimeError("Falha na predição: número de resultados difere do lote")
+        return [self._filter_result(result, image.shape[:2]) for image, result in zip(images, results)]
 
-            if len(detections) >= self.config.max_tags:
-                break
+    def detect_objects(self, image: np.ndarray) -> List[Detection]:
+        """Retorna lista de (label_pt, confiança, bbox) ordenada por confiança."""
+        return _to_detections(*self.detect_arrays(image))
 
-        logger.debug("Detectados %d objeto(s) na imagem", len(detections))
-        return detections
+    def detect_objects_batch(self, images: List[np.ndarray]) -> List[List[Detection]]:
+        """Processa várias imagens em uma única chamada ao modelo; retorna uma lista por imagem."""
+        return [_to_detections(*arrays) for arrays in self.detect_arrays_batch(images)]
 
     def detect(self, image: np.ndarray) -> List[str]:
         """Retorna somente os nomes das tags detectadas."""
-        return [label for label, _, _ in self.detect_objects(image)]
+        return self.detect_arrays(image).labels.tolist()
 
     def detect_with_scores(self, image: np.ndarray) -> List[dict]:
         """Retorna tags com confiança e coordenadas de bounding box."""
-        return [
-            {"tag": label, "confidence": round(conf, 4), "bbox": [round(v, 1) for v in xyxy]}
-            for label, conf, xyxy in self.detect_objects(image)
-        ]
+        return _to_scores(*self.detect_arrays(image))
+
+    def detect_with_scores_batch(self, images: List[np.ndarray]) -> List[List[dict]]:
+        """Versão em lote de detect_with_scores, com uma única chamada ao modelo."""
+        return [_to_scores(*arrays) for arrays in self.detect_arrays_batch(images)]
+
+
+def _to_detections(labels: np.ndarray, confs: np.ndarray, bboxes: np.ndarray) -> List[Detection]:
+    return list(zip(labels.tolist(), confs.tolist(), bboxes.tolist()))
+
+
+def _to_scores(labels: np.ndarray, confs: np.ndarray, bboxes: np.ndarray) -> List[dict]:
+    # Arredondamento vetorizado; float64 evita ruído de float32 nos valores serializados.
+    confs = np.round(confs.astype(np.float64), 4).tolist()
+    bboxes = np.round(bboxes.astype(np.float64), 1).tolist()
+    return [
+        {"tag": label, "confidence": conf, "bbox": bbox}
+        for label, conf, bbox in zip(labels.tolist(), confs, bboxes)
+    ]